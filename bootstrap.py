@@ -0,0 +1,202 @@
+"""
+Batched bootstrap confidence intervals for per-symbol and pooled return stats.
+
+Resample indices (iid or stationary blocks over dates) are drawn once and shared by all symbols, so cross-sectional
+dependence is preserved in the pooled stats. Each chunk of replicates is gathered for all symbols at once and reduced
+to power sums with NumPy, in chunks whose size is bounded by max_chunk_bytes, optionally on a process pool.
+"""
+from __future__ import annotations
+
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+BOOT_STATS = ["ann_mean", "ann_vol", "skew", "kurtosis"]
+
+# panel shared with process-pool workers, set once per worker by _init_worker
+_worker_panel: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+
+def bootstrap_indices(
+    n_obs: int,
+    n_boot: int,
+    method: str = "stationary",
+    block_size: float = 20.0,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """Return an (n_boot, n_obs) array of resampled row indices.
+
+    method "iid" draws rows independently. method "stationary" is the Politis-Romano stationary bootstrap: blocks
+    start at uniform random rows, have geometric lengths with mean block_size, and wrap around the end of the sample.
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+    if method == "iid":
+        return rng.integers(0, n_obs, (n_boot, n_obs))
+    if method != "stationary":
+        raise ValueError(f"Unsupported bootstrap method: {method}")
+
+    idx = rng.integers(0, n_obs, (n_boot, n_obs))
+    new_block = rng.random((n_boot, n_obs)) < 1.0 / block_size
+    new_block[:, 0] = True
+    # position of the most recent block start for each row, so idx = start index + offset within block
+    pos = np.arange(n_obs)
+    last_start = np.maximum.accumulate(np.where(new_block, pos, 0), axis=1)
+    start = np.take_along_axis(idx, last_start, axis=1)
+    return (start + (pos - last_start)) % n_obs
+
+
+def _chunk_sizes(n_obs: int, n_sym: int, n_boot: int, max_chunk_bytes: float, boot_batch: int = 32) -> Tuple[int, int]:
+    """Return (replicates, symbols) per chunk so that the gathered (replicates, n_obs, symbols) arrays fit in budget.
+
+    Symbols are split first so that up to boot_batch replicates are gathered together even for large panels; only if
+    a single symbol column of boot_batch replicates exceeds the budget do chunks shrink to fewer replicates.
+    """
+    # a gathered chunk needs a few float64 temporaries of the same shape
+    max_elems = max(1, int(max_chunk_bytes // (8 * 4)))
+    batch = max(1, min(n_boot, boot_batch))
+    sym_chunk = max(1, min(n_sym, max_elems // (n_obs * batch)))
+    boot_chunk = max(1, min(n_boot, max_elems // (n_obs * sym_chunk)))
+    return boot_chunk, sym_chunk
+
+
+def _power_sums(x: np.ndarray, mask: np.ndarray, idx: np.ndarray, sym_chunk: int) -> np.ndarray:
+    """Return a (5, replicates, symbols) array of count and sums of x, x^2, x^3, x^4 for each resample in idx.
+
+    x holds zeros where mask is False, so missing values drop out of every sum.
+    """
+    n_sym = x.shape[1]
+    out = np.empty((5, idx.shape[0], n_sym))
+    for j0 in range(0, n_sym, sym_chunk):
+        cols = slice(j0, j0 + sym_chunk)
+        g = x[:, cols][idx]
+        g2 = g * g
+        out[0, :, cols] = mask[:, cols][idx].sum(axis=1)
+        out[1, :, cols] = g.sum(axis=1)
+        out[2, :, cols] = g2.sum(axis=1)
+        out[3, :, cols] = (g2 * g).sum(axis=1)
+        out[4, :, cols] = (g2 * g2).sum(axis=1)
+    return out
+
+
+def _init_worker(x: np.ndarray, mask: np.ndarray) -> None:
+    global _worker_panel
+    _worker_panel = (x, mask)
+
+
+def _worker_power_sums(idx: np.ndarray, sym_chunk: int) -> np.ndarray:
+    x, mask = _worker_panel
+    return _power_sums(x, mask, idx, sym_chunk)
+
+
+def _shift_power_sums(sums: np.ndarray, c: np.ndarray) -> np.ndarray:
+    """Convert power sums of y to power sums of y + c, with c broadcast over the last axis."""
+    n, s1, s2, s3, s4 = sums
+    return np.stack([
+        n,
+        s1 + n * c,
+        s2 + 2 * c * s1 + n * c**2,
+        s3 + 3 * c * s2 + 3 * c**2 * s1 + n * c**3,
+        s4 + 4 * c * s3 + 6 * c**2 * s2 + 4 * c**3 * s1 + n * c**4,
+    ])
+
+
+def _stats_from_power_sums(sums: np.ndarray, shift, obs_year: int) -> Dict[str, np.ndarray]:
+    """Annualized mean and vol, skew and excess kurtosis (bias-corrected as in pandas) from power sums of x - shift."""
+    n, s1, s2, s3, s4 = sums
+    with np.errstate(invalid="ignore", divide="ignore"):
+        m = s1 / n
+        c2 = s2 / n - m**2
+        c3 = s3 / n - 3 * m * s2 / n + 2 * m**3
+        c4 = s4 / n - 4 * m * s3 / n + 6 * m**2 * s2 / n - 3 * m**4
+        c2 = np.maximum(c2, 0.0)
+        g1 = c3 / c2**1.5
+        g2 = c4 / c2**2 - 3.0
+        skew = np.sqrt(n * (n - 1)) / (n - 2) * g1
+        kurt = (n - 1) / ((n - 2) * (n - 3)) * ((n + 1) * g2 + 6.0)
+        ann_vol = np.sqrt(c2 * n / (n - 1) * obs_year)
+    return {
+        "ann_mean": np.where(n > 0, (m + shift) * obs_year, np.nan),
+        "ann_vol": np.where(n > 1, ann_vol, np.nan),
+        "skew": np.where(n > 2, skew, np.nan),
+        "kurtosis": np.where(n > 3, kurt, np.nan),
+    }
+
+
+def _percentile_name(stat: str, q: float) -> str:
+    return f"{stat}_p{q:g}"
+
+
+def bootstrap_return_stats(
+    df_ret: pd.DataFrame,
+    obs_year: int,
+    n_boot: int = 1000,
+    method: str = "stationary",
+    block_size: float = 20.0,
+    percentiles: Sequence[float] = (2.5, 97.5),
+    max_chunk_bytes: float = 256e6,
+    n_jobs: int = 1,
+    seed: Optional[int] = 0,
+) -> Tuple[pd.DataFrame, Dict[str, float]]:
+    """Bootstrap percentile intervals for annualized mean, vol, skew and kurtosis.
+
+    Returns (df_ci, pooled_ci): a DataFrame indexed by symbol, and a dict for the pooled stats, both with columns
+    such as "ann_mean_p2.5" and "ann_mean_p97.5", to be joined onto the tables from return_stats_by_symbol and
+    pooled_return_stats. Replicates are processed in batches of up to 32 (splitting symbols as needed) so that each
+    gathered chunk takes at most about max_chunk_bytes; n_jobs > 1 spreads the batches over a process pool.
+    """
+    x = df_ret.to_numpy(dtype=float, copy=True)
+    mask = np.isfinite(x)
+    n_obs, n_sym = x.shape
+    if n_obs == 0 or n_sym == 0:
+        # e.g. a date window with no data: NaN intervals with the usual columns
+        df_ci = pd.DataFrame(np.nan, index=df_ret.columns, columns=bootstrap_columns(percentiles))
+        df_ci.index.name = "symbol"
+        return df_ci, {name: np.nan for name in df_ci.columns}
+
+    # shift each symbol by its sample mean so the power sums are well conditioned
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mu = np.where(mask, x, 0.0).sum(axis=0) / mask.sum(axis=0)
+    mu = np.where(np.isfinite(mu), mu, 0.0)
+    x -= mu
+    x[~mask] = 0.0
+    n_total = mask.sum()
+    mu_pooled = (mu * mask.sum(axis=0)).sum() / n_total if n_total > 0 else 0.0
+
+    rng = np.random.default_rng(seed)
+    idx = bootstrap_indices(n_obs, n_boot, method=method, block_size=block_size, rng=rng)
+    boot_chunk, sym_chunk = _chunk_sizes(n_obs, n_sym, n_boot, max_chunk_bytes)
+    idx_chunks = [idx[b0:b0 + boot_chunk] for b0 in range(0, n_boot, boot_chunk)]
+
+    if n_jobs > 1 and len(idx_chunks) > 1:
+        with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker, initargs=(x, mask)) as pool:
+            chunk_sums = list(pool.map(_worker_power_sums, idx_chunks, [sym_chunk] * len(idx_chunks)))
+    else:
+        chunk_sums = [_power_sums(x, mask, idx_b, sym_chunk) for idx_b in idx_chunks]
+
+    pooled_sums = [_shift_power_sums(s, mu - mu_pooled).sum(axis=2) for s in chunk_sums]
+    by_symbol = _stats_from_power_sums(np.concatenate(chunk_sums, axis=1), mu, obs_year)
+    pooled = _stats_from_power_sums(np.concatenate(pooled_sums, axis=1), mu_pooled, obs_year)
+
+    df_ci = pd.DataFrame(index=df_ret.columns)
+    df_ci.index.name = "symbol"
+    pooled_ci: Dict[str, float] = {}
+    for stat in BOOT_STATS:
+        # symbols with too few observations give all-NaN replicates
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            q_sym = np.nanpercentile(by_symbol[stat], percentiles, axis=0)
+            q_pooled = np.nanpercentile(pooled[stat], percentiles)
+        for k, q in enumerate(percentiles):
+            name = _percentile_name(stat, q)
+            df_ci[name] = q_sym[k]
+            pooled_ci[name] = float(q_pooled[k])
+    return df_ci, pooled_ci
+
+
+def bootstrap_columns(percentiles: Sequence[float] = (2.5, 97.5)) -> List[str]:
+    """Names of the percentile columns produced by bootstrap_return_stats, in output order."""
+    return [_percentile_name(stat, q) for stat in BOOT_STATS for q in percentiles]
@@ -0,0 +1,62 @@
+"""
+Read saved price files and select fields from them.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import List
+
+import pandas as pd
+
+
+def _is_field_level(labels) -> bool:
+    """True if labels look like field names rather than a row of prices read as a second header row."""
+    for label in labels:
+        text = str(label)
+        if text.startswith("Unnamed:"):
+            continue
+        try:
+            float(text)
+        except ValueError:
+            return True
+    return False
+
+
+def read_prices_file(path: Path) -> pd.DataFrame:
+    """Read prices from CSV/Parquet/Feather with either MultiIndex or single-level columns."""
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        try:
+            df = pd.read_csv(path, header=[0, 1], index_col=0, parse_dates=True)
+            # a flat file also parses with two header rows, taking its first row of prices as the second level
+            if (isinstance(df.columns, pd.MultiIndex) and df.columns.nlevels == 2
+                    and _is_field_level(df.columns.get_level_values(1))):
+                if isinstance(df.index, pd.DatetimeIndex):
+                    df = df[~df.index.isna()]
+                return df
+        except Exception:
+            pass
+
+        df = pd.read_csv(path, header=0, index_col=0, parse_dates=True)
+        if isinstance(df.index, pd.DatetimeIndex):
+            df = df[~df.index.isna()]
+        return df
+
+    if suffix == ".parquet":
+        return pd.read_parquet(path)
+
+    raise ValueError(f"Unsupported input suffix: {suffix}")
+
+
+def get_fields_from_df(df_all: pd.DataFrame, flat_field: str) -> List[str]:
+    """Return the fields in a (symbol, field) MultiIndex frame, or [flat_field] for single-level columns."""
+    if isinstance(df_all.columns, pd.MultiIndex) and df_all.columns.nlevels == 2:
+        return list(pd.unique(df_all.columns.get_level_values(1)))
+    return [flat_field]
+
+
+def get_prices_for_field(df_all: pd.DataFrame, field: str) -> pd.DataFrame:
+    """Return the dates x symbols prices for field (the frame itself for single-level columns)."""
+    if isinstance(df_all.columns, pd.MultiIndex) and df_all.columns.nlevels == 2:
+        return df_all.xs(field, level=1, axis=1)
+    return df_all
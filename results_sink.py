@@ -0,0 +1,80 @@
+"""
+Write result tables to Parquet, Arrow IPC (Feather) or CSV on a background thread, with run metadata.
+"""
+from __future__ import annotations
+
+import json
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import pandas as pd
+
+_SUFFIXES = {"parquet": ".parquet", "arrow": ".arrow", "csv": ".csv"}
+
+
+def preview(df: pd.DataFrame, max_rows: Optional[int] = 20) -> str:
+    """Return df as a string, truncated to max_rows rows and max_rows columns (all of df if None)."""
+    if max_rows is None or (len(df) <= max_rows and df.shape[1] <= max_rows):
+        return df.to_string()
+    return df.to_string(max_rows=max_rows, max_cols=max_rows) + f"\n[{len(df)} rows x {df.shape[1]} columns]"
+
+
+def _write_table(df: pd.DataFrame, path: Path, fmt: str) -> None:
+    if fmt == "parquet":
+        df.to_parquet(path)
+    elif fmt == "arrow":
+        # Feather (Arrow IPC) cannot store a non-default index, so write it as a column
+        df.reset_index().to_feather(path)
+    else:
+        df.to_csv(path)
+
+
+class ResultsSink:
+    """Write result tables under out_dir, one file per table, on a single background thread.
+
+    write() returns immediately so that writing overlaps with later computation; tables must not be modified after
+    they are passed to write(). close() waits for pending writes, re-raises the first write error, and writes
+    run_metadata.json with the given metadata and the list of files written.
+    """
+
+    def __init__(self, out_dir, fmt: str = "parquet", metadata: Optional[Dict[str, Any]] = None):
+        if fmt not in _SUFFIXES:
+            raise ValueError(f"Unsupported results format: {fmt}")
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.fmt = fmt
+        self.metadata: Dict[str, Any] = dict(metadata) if metadata is not None else {}
+        self._t_start = time.perf_counter()
+        self._pool = ThreadPoolExecutor(max_workers=1)
+        self._futures: List[Future] = []
+        self._files: List[str] = []
+
+    def write(self, name: str, df: pd.DataFrame) -> Path:
+        """Queue df to be written as <out_dir>/<name><suffix> and return the path."""
+        path = self.out_dir / (name.replace(" ", "_") + _SUFFIXES[self.fmt])
+        self._futures.append(self._pool.submit(_write_table, df, path, self.fmt))
+        self._files.append(path.name)
+        return path
+
+    def close(self) -> None:
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._pool.shutdown(wait=True)
+        meta = dict(self.metadata)
+        meta["created"] = datetime.now().isoformat(timespec="seconds")
+        meta["format"] = self.fmt
+        meta["files"] = self._files
+        meta["elapsed_seconds"] = round(time.perf_counter() - self._t_start, 3)
+        with open(self.out_dir / "run_metadata.json", "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2, default=str)
+
+    def __enter__(self) -> "ResultsSink":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
@@ -74,3 +74,134 @@ def corr_offdiag_stats(df_ret: pd.DataFrame) -> Dict[str, float]:
         "min": offdiag.min(),
         "max": offdiag.max(),
     }
+
+
+def _standardized_panel(df_ret: pd.DataFrame):
+    """Standardize returns for a factor fit of the correlation matrix.
+
+    Returns (x, keep, first, last, n_obs): a T x N panel in which each column is demeaned and scaled to unit sum of
+    squares over its own finite observations, with missing values set to zero (mean imputation), a boolean mask of
+    the columns of df_ret retained in x, and for each retained column the first and one-past-last row with data and
+    the number of observations. Columns with fewer than 3 observations or zero variance are dropped.
+    """
+    x = df_ret.to_numpy(dtype=float, copy=True)
+    mask = np.isfinite(x)
+    n_obs = mask.sum(axis=0)
+    x[~mask] = 0.0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        x -= x.sum(axis=0) / n_obs
+    x[~mask] = 0.0
+    ss = (x * x).sum(axis=0)
+    keep = (n_obs >= 3) & (ss > 0)
+    x = x[:, keep] / np.sqrt(ss[keep])
+    mask = mask[:, keep]
+    first = mask.argmax(axis=0)
+    last = mask.shape[0] - mask[::-1].argmax(axis=0)
+    return x, keep, first, last, n_obs[keep]
+
+
+def _randomized_svd(x: np.ndarray, k: int, n_oversample: int, n_iter: int, rng: np.random.Generator):
+    """Randomized truncated SVD (Halko, Martinsson and Tropp) of x, returning (s, vt) for the top k components."""
+    n_cols = min(k + n_oversample, min(x.shape))
+    q, _ = np.linalg.qr(x @ rng.standard_normal((x.shape[1], n_cols)))
+    for _ in range(n_iter):
+        q, _ = np.linalg.qr(x.T @ q)
+        q, _ = np.linalg.qr(x @ q)
+    _, s, vt = np.linalg.svd(q.T @ x, full_matrices=False)
+    return s[:k], vt[:k]
+
+
+def _pair_corr(x: np.ndarray, i: np.ndarray, j: np.ndarray, chunk: int = 256) -> np.ndarray:
+    """Pairwise-complete Pearson correlations of columns (i[m], j[m]) of x, matching DataFrame.corr().
+
+    Only the columns of each chunk of pairs are gathered, so x is never copied as a whole.
+    """
+    out = np.empty(len(i))
+    for start in range(0, len(i), chunk):
+        a = x[:, i[start:start + chunk]]
+        b = x[:, j[start:start + chunk]]
+        m = np.isfinite(a) & np.isfinite(b)
+        cnt = m.sum(axis=0)
+        a = np.where(m, a, 0.0)
+        b = np.where(m, b, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            a = np.where(m, a - a.sum(axis=0) / cnt, 0.0)
+            b = np.where(m, b - b.sum(axis=0) / cnt, 0.0)
+            r = (a * b).sum(axis=0) / np.sqrt((a * a).sum(axis=0) * (b * b).sum(axis=0))
+        r[cnt < 2] = np.nan
+        out[start:start + chunk] = r
+    return out
+
+
+def _sample_pairs(n: int, size: int, rng: np.random.Generator):
+    """Draw size random column pairs (i, j) with i < j, uniformly over the upper triangle."""
+    i = rng.integers(0, n, size)
+    j = rng.integers(0, n - 1, size)
+    j[j >= i] += 1
+    return np.minimum(i, j), np.maximum(i, j)
+
+
+def corr_offdiag_stats_approx(
+    df_ret: pd.DataFrame,
+    n_factors: int = 20,
+    n_sample_pairs: int = 200_000,
+    n_check_pairs: int = 2_000,
+    n_oversample: int = 10,
+    n_iter: int = 4,
+    seed: int = 0,
+) -> Dict[str, float]:
+    """Approximate off-diagonal correlation summary stats from a k-factor model of the return panel.
+
+    The standardized, mean-imputed panel is factored with a randomized SVD, so run time is roughly linear in the
+    number of symbols. Factor-model correlations are corrected for the shrinkage caused by missing values (gaps
+    within a symbol's history and non-overlapping histories), and the summary stats are computed over n_sample_pairs
+    random pairs. As an error bound, n_check_pairs other random pairs are compared with the exact pairwise-complete
+    correlations used by corr_offdiag_stats, giving the mean and max absolute error of the approximation.
+    """
+    nan_stats = {"median": np.nan, "mean": np.nan, "sd": np.nan, "min": np.nan, "max": np.nan,
+                 "err_mean_abs": np.nan, "err_max_abs": np.nan}
+    # every retained column needs at least 3 observations, e.g. a date window with no data gives none
+    if df_ret.shape[0] < 3 or df_ret.shape[1] < 2:
+        return nan_stats
+    x, keep, first, last, n_obs = _standardized_panel(df_ret)
+    n = x.shape[1]
+    if n < 2:
+        return nan_stats
+
+    rng = np.random.default_rng(seed)
+    k = max(1, min(n_factors, min(x.shape)))
+    s, vt = _randomized_svd(x, k, n_oversample, n_iter, rng)
+    # zero-filled gaps shrink corr[i, j] by about sqrt(fill_i * fill_j), fill = fraction of the span observed
+    span = last - first
+    loadings = vt.T * s  # N x k, corr[i, j] ~ loadings[i] @ loadings[j] for i != j
+    loadings /= np.sqrt(n_obs / span)[:, None]
+
+    def approx_corr(i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        # partly overlapping histories shrink corr[i, j] by overlap / sqrt(span_i * span_j)
+        overlap = np.minimum(last[i], last[j]) - np.maximum(first[i], first[j])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            c = (loadings[i] * loadings[j]).sum(axis=1) * np.sqrt(span[i] * span[j]) / overlap
+        c[overlap < 3] = np.nan
+        return np.clip(c, -1.0, 1.0)
+
+    i, j = _sample_pairs(n, n_sample_pairs, rng)
+    c_sample = approx_corr(i, j)
+    c_sample = c_sample[np.isfinite(c_sample)]
+    if c_sample.size == 0:
+        return nan_stats
+
+    i, j = _sample_pairs(n, n_check_pairs, rng)
+    # map positions among the kept columns back to df_ret; to_numpy is a view for an all-float frame
+    cols = np.flatnonzero(keep)
+    err = np.abs(approx_corr(i, j) - _pair_corr(df_ret.to_numpy(dtype=float), cols[i], cols[j]))
+    err = err[np.isfinite(err)]
+
+    return {
+        "median": float(np.median(c_sample)),
+        "mean": float(c_sample.mean()),
+        "sd": float(c_sample.std(ddof=1)) if c_sample.size > 1 else np.nan,
+        "min": float(c_sample.min()),
+        "max": float(c_sample.max()),
+        "err_mean_abs": float(err.mean()) if err.size > 0 else np.nan,
+        "err_max_abs": float(err.max()) if err.size > 0 else np.nan,
+    }
@@ -9,31 +9,16 @@ from typing import List, Optional
 
 import pandas as pd
 
-from stats import compute_returns, pooled_return_stats, return_stats_by_symbol, corr_offdiag_stats
-
-
-def _read_prices_file(path: Path) -> pd.DataFrame:
-    """Read prices from CSV/Parquet/Feather with either MultiIndex or single-level columns."""
-    suffix = path.suffix.lower()
-    if suffix == ".csv":
-        try:
-            df = pd.read_csv(path, header=[0, 1], index_col=0, parse_dates=True)
-            if isinstance(df.columns, pd.MultiIndex) and df.columns.nlevels == 2:
-                if isinstance(df.index, pd.DatetimeIndex):
-                    df = df[~df.index.isna()]
-                return df
-        except Exception:
-            pass
-
-        df = pd.read_csv(path, header=0, index_col=0, parse_dates=True)
-        if isinstance(df.index, pd.DatetimeIndex):
-            df = df[~df.index.isna()]
-        return df
-
-    if suffix == ".parquet":
-        return pd.read_parquet(path)
-
-    raise ValueError(f"Unsupported input suffix: {suffix}")
+from stats import (
+    compute_returns,
+    pooled_return_stats,
+    return_stats_by_symbol,
+    corr_offdiag_stats,
+    corr_offdiag_stats_approx,
+)
+from bootstrap import bootstrap_return_stats, bootstrap_columns
+from results_sink import ResultsSink, preview
+from prices_io import read_prices_file, get_fields_from_df, get_prices_for_field
 
 
 def _parse_fields_arg(fields_arg: Optional[str], available: List[str]) -> List[str]:
@@ -45,18 +30,6 @@ def _parse_fields_arg(fields_arg: Optional[str], available: List[str]) -> List[s
     return fields
 
 
-def _get_fields_from_df(df_all: pd.DataFrame, flat_field: str) -> List[str]:
-    if isinstance(df_all.columns, pd.MultiIndex) and df_all.columns.nlevels == 2:
-        return list(pd.unique(df_all.columns.get_level_values(1)))
-    return [flat_field]
-
-
-def _get_prices_for_field(df_all: pd.DataFrame, field: str) -> pd.DataFrame:
-    if isinstance(df_all.columns, pd.MultiIndex) and df_all.columns.nlevels == 2:
-        return df_all.xs(field, level=1, axis=1)
-    return df_all
-
-
 def main() -> int:
     t_start = time.perf_counter()
     pd.options.display.float_format = "{:.4f}".format
@@ -73,6 +46,9 @@ def main() -> int:
 
     # correlation off-diagonal summary stats (median/mean/sd/min/max) by field
     compute_corr_stats = False # True
+    # "exact" uses the full correlation matrix; "approx" fits a k-factor model (roughly linear in #symbols)
+    corr_stats_method = "exact" # "approx"
+    corr_n_factors = 20
 
     # fields to process (if None, uses fields in CSV)
     fields = None
@@ -86,8 +62,22 @@ def main() -> int:
     print_return_stats_by_symbol = True
     obs_year = 252
 
+    # bootstrap percentile intervals (2.5, 97.5) for ann_mean/ann_vol/skew/kurtosis
+    bootstrap_ci = False # True
+    n_boot = 1000
+    boot_method = "stationary" # "iid"
+    boot_block_size = 20
+    boot_n_jobs = 1
+
+    # write result tables to out_results_dir (None to disable)
+    # console shows at most print_max_rows rows and columns per table
+    out_results_dir = None # "results"
+    out_results_format = "parquet" # "arrow" # "csv"
+    write_corr_matrix = False
+    print_max_rows = 20 # None
+
     in_path = Path(in_prices_file)
-    df_all = _read_prices_file(in_path)
+    df_all = read_prices_file(in_path)
     if date_min is not None:
         date_min = pd.to_datetime(date_min)
     if date_max is not None:
@@ -102,7 +92,7 @@ def main() -> int:
         else:
             df_all = df_all.iloc[:, :max_symbols]
 
-    fields_available = _get_fields_from_df(df_all, flat_field="Close")
+    fields_available = get_fields_from_df(df_all, flat_field="Close")
     fields = _parse_fields_arg(fields, fields_available)
     fields_ret = _parse_fields_arg(fields_ret, fields)
     if isinstance(df_all.columns, pd.MultiIndex) and df_all.columns.nlevels == 2:
@@ -115,56 +105,112 @@ def main() -> int:
     print("fields:", fields)
     print("fields_ret:", fields_ret)
     print("return_type:", "log" if use_log_returns else "simple")
-
-    corr_stats = {}
-    return_stats = {}
-
-    for field in fields:
-        print("\nfield:", field)
-        df = _get_prices_for_field(df_all, field)
-        if dropna_df:
-            df = df.dropna()
-
-        if len(df.index) > 0:
-            print("#obs, first, last:", len(df.index), df.index[0].date(), df.index[-1].date())
-        else:
-            print("#obs, first, last:", 0, "nan", "nan")
-
-        if field not in fields_ret:
-            continue
-
-        df_ret = ret_scale * compute_returns(df, log_returns=use_log_returns)
-
-        if describe_returns:
-            print(df_ret.describe())
-
-        if print_return_stats:
-            return_stats[field] = pooled_return_stats(df_ret, obs_year)
-
-        if print_return_stats_by_symbol:
-            df_stats = return_stats_by_symbol(df_ret, obs_year)
-            print("\nreturn stats by symbol (" + field.replace(" ", "_") + "):\n" + df_stats.to_string())
-
-        if (print_corr_returns or compute_corr_stats) and df.shape[1] > 1:
-            corr = df_ret.corr()
-            if print_corr_returns:
-                print("\ncorrelations (" + field.replace(" ", "_") + "):\n" + corr.to_string())
-            if compute_corr_stats:
-                corr_stats[field] = corr_offdiag_stats(df_ret)
-
-    if compute_corr_stats and len(corr_stats) > 0:
-        df_corr_stats = pd.DataFrame.from_dict(corr_stats, orient="index")
-        df_corr_stats = df_corr_stats.reindex(fields_ret)
-        df_corr_stats = df_corr_stats[["median", "mean", "sd", "min", "max"]]
-        df_corr_stats.index.name = "field"
-        print("\noff-diagonal correlation stats by field:\n" + df_corr_stats.to_string())
-
-    if print_return_stats and len(return_stats) > 0:
-        df_return_stats = pd.DataFrame.from_dict(return_stats, orient="index")
-        df_return_stats = df_return_stats.reindex(fields_ret)
-        df_return_stats = df_return_stats[["ann_mean", "ann_vol", "skew", "kurtosis", "min", "max"]]
-        df_return_stats.index.name = "field"
-        print("\nreturn stats (pooled across symbols):\n" + df_return_stats.to_string())
+    if compute_corr_stats:
+        print("corr_stats_method:", corr_stats_method)
+
+    sink = None
+    if out_results_dir is not None:
+        sink = ResultsSink(out_results_dir, fmt=out_results_format, metadata={
+            "script": Path(__file__).name,
+            "prices_file": in_prices_file,
+            "n_obs": df_all.shape[0],
+            "n_symbols": num_symbols,
+            "first": df_all.index[0] if len(df_all.index) > 0 else None,
+            "last": df_all.index[-1] if len(df_all.index) > 0 else None,
+            "fields_ret": fields_ret,
+            "return_type": "log" if use_log_returns else "simple",
+            "ret_scale": ret_scale,
+            "obs_year": obs_year,
+            "corr_stats_method": corr_stats_method if compute_corr_stats else None,
+            "n_boot": n_boot if bootstrap_ci else None,
+        })
+        print("results dir, format:", out_results_dir, out_results_format)
+
+    try:
+        corr_stats = {}
+        return_stats = {}
+
+        for field in fields:
+            print("\nfield:", field)
+            df = get_prices_for_field(df_all, field)
+            if dropna_df:
+                df = df.dropna()
+
+            if len(df.index) > 0:
+                print("#obs, first, last:", len(df.index), df.index[0].date(), df.index[-1].date())
+            else:
+                print("#obs, first, last:", 0, "nan", "nan")
+
+            if field not in fields_ret:
+                continue
+
+            df_ret = ret_scale * compute_returns(df, log_returns=use_log_returns)
+
+            if describe_returns:
+                print(df_ret.describe())
+
+            if bootstrap_ci and (print_return_stats or print_return_stats_by_symbol):
+                df_ci, pooled_ci = bootstrap_return_stats(
+                    df_ret, obs_year, n_boot=n_boot, method=boot_method, block_size=boot_block_size, n_jobs=boot_n_jobs
+                )
+
+            if print_return_stats:
+                return_stats[field] = pooled_return_stats(df_ret, obs_year)
+                if bootstrap_ci:
+                    return_stats[field].update(pooled_ci)
+
+            if print_return_stats_by_symbol:
+                df_stats = return_stats_by_symbol(df_ret, obs_year)
+                if bootstrap_ci:
+                    df_stats = df_stats.join(df_ci)
+                print("\nreturn stats by symbol (" + field.replace(" ", "_") + "):\n"
+                      + preview(df_stats, print_max_rows))
+                if sink is not None:
+                    sink.write("return_stats_by_symbol_" + field, df_stats)
+
+            write_corr = sink is not None and write_corr_matrix
+            if (print_corr_returns or write_corr) and df.shape[1] > 1:
+                corr = df_ret.corr()
+                if print_corr_returns:
+                    print("\ncorrelations (" + field.replace(" ", "_") + "):\n" + preview(corr, print_max_rows))
+                if write_corr:
+                    sink.write("corr_" + field, corr)
+
+            if compute_corr_stats and df.shape[1] > 1:
+                if corr_stats_method == "approx":
+                    corr_stats[field] = corr_offdiag_stats_approx(df_ret, n_factors=corr_n_factors)
+                else:
+                    corr_stats[field] = corr_offdiag_stats(df_ret)
+
+        if compute_corr_stats and len(corr_stats) > 0:
+            df_corr_stats = pd.DataFrame.from_dict(corr_stats, orient="index")
+            df_corr_stats = df_corr_stats.reindex(fields_ret)
+            corr_cols = ["median", "mean", "sd", "min", "max"]
+            if corr_stats_method == "approx":
+                corr_cols += ["err_mean_abs", "err_max_abs"]
+            df_corr_stats = df_corr_stats[corr_cols]
+            df_corr_stats.index.name = "field"
+            print("\noff-diagonal correlation stats by field:\n" + df_corr_stats.to_string())
+            if sink is not None:
+                sink.write("corr_stats", df_corr_stats)
+
+        if print_return_stats and len(return_stats) > 0:
+            df_return_stats = pd.DataFrame.from_dict(return_stats, orient="index")
+            df_return_stats = df_return_stats.reindex(fields_ret)
+            return_cols = ["ann_mean", "ann_vol", "skew", "kurtosis", "min", "max"]
+            if bootstrap_ci:
+                return_cols += bootstrap_columns()
+            df_return_stats = df_return_stats[return_cols]
+            df_return_stats.index.name = "field"
+            print("\nreturn stats (pooled across symbols):\n" + df_return_stats.to_string())
+            if sink is not None:
+                sink.write("return_stats_pooled", df_return_stats)
+    finally:
+        # always wait for pending writes and write run_metadata.json, also after an error
+        if sink is not None:
+            sink.close()
+    if sink is not None:
+        print("\nwrote results to", out_results_dir)
 
     elapsed = time.perf_counter() - t_start
     print(f"\ntime elapsed: {elapsed:.3f} seconds")
@@ -9,7 +9,15 @@ from typing import Optional
 
 import pandas as pd
 
-from stats import compute_returns, pooled_return_stats, return_stats_by_symbol, corr_offdiag_stats
+from stats import (
+    compute_returns,
+    pooled_return_stats,
+    return_stats_by_symbol,
+    corr_offdiag_stats,
+    corr_offdiag_stats_approx,
+)
+from bootstrap import bootstrap_return_stats, bootstrap_columns
+from results_sink import ResultsSink, preview
 
 
 def _read_prices_file(path: Path) -> pd.DataFrame:
@@ -33,6 +41,15 @@ def main() -> int:
     print_corr_returns = False # True
     describe_returns = False
     compute_corr_stats = True
+    # "exact" uses the full correlation matrix; "approx" fits a k-factor model (roughly linear in #symbols)
+    corr_stats_method = "exact" # "approx"
+    corr_n_factors = 20
+    # bootstrap percentile intervals (2.5, 97.5) for ann_mean/ann_vol/skew/kurtosis
+    bootstrap_ci = False # True
+    n_boot = 1000
+    boot_method = "stationary" # "iid"
+    boot_block_size = 20
+    boot_n_jobs = 1
     print_return_stats = True
     print_return_stats_by_symbol = True
     obs_year = 252
@@ -41,6 +58,12 @@ def main() -> int:
     max_symbols = None
     date_min = None
     date_max = None
+    # write result tables to out_results_dir (None to disable)
+    # console shows at most print_max_rows rows and columns per table
+    out_results_dir = None # "results"
+    out_results_format = "parquet" # "arrow" # "csv"
+    write_corr_matrix = False
+    print_max_rows = 20 # None
 
     print("prices file:", in_prices_file)
     in_path = Path(in_prices_file)
@@ -61,6 +84,8 @@ def main() -> int:
     print("#obs, symbols, columns:", df_all.shape[0], num_symbols, df_all.shape[1])
     print("return_type:", "log" if use_log_returns else "simple")
     print("ret_scale:", ret_scale)
+    if compute_corr_stats:
+        print("corr_stats_method:", corr_stats_method)
 
     if dropna_df:
         df_all = df_all.dropna()
@@ -70,32 +95,82 @@ def main() -> int:
     else:
         print("#obs, first, last:", 0, "nan", "nan")
 
-    df_ret = ret_scale * compute_returns(df_all, log_returns=use_log_returns)
-
-    if describe_returns:
-        print(df_ret.describe())
-
-    if print_return_stats:
-        pooled = pooled_return_stats(df_ret, obs_year)
-        df_pooled = pd.DataFrame.from_dict({"all": pooled}, orient="index")
-        df_pooled = df_pooled[["ann_mean", "ann_vol", "skew", "kurtosis", "min", "max"]]
-        df_pooled.index.name = "field"
-        print("\nreturn stats (pooled across symbols):\n" + df_pooled.to_string())
-
-    if print_return_stats_by_symbol:
-        df_stats = return_stats_by_symbol(df_ret, obs_year)
-        print("\nreturn stats by symbol:\n" + df_stats.to_string())
-
-    if (print_corr_returns or compute_corr_stats) and df_all.shape[1] > 1:
-        corr = df_ret.corr()
-        if print_corr_returns:
-            print("\ncorrelations:\n" + corr.to_string())
-        if compute_corr_stats:
-            corr_stats = corr_offdiag_stats(df_ret)
+    sink = None
+    if out_results_dir is not None:
+        sink = ResultsSink(out_results_dir, fmt=out_results_format, metadata={
+            "script": Path(__file__).name,
+            "prices_file": in_prices_file,
+            "n_obs": df_all.shape[0],
+            "n_symbols": num_symbols,
+            "first": df_all.index[0] if len(df_all.index) > 0 else None,
+            "last": df_all.index[-1] if len(df_all.index) > 0 else None,
+            "return_type": "log" if use_log_returns else "simple",
+            "ret_scale": ret_scale,
+            "obs_year": obs_year,
+            "corr_stats_method": corr_stats_method if compute_corr_stats else None,
+            "n_boot": n_boot if bootstrap_ci else None,
+        })
+        print("results dir, format:", out_results_dir, out_results_format)
+
+    try:
+        df_ret = ret_scale * compute_returns(df_all, log_returns=use_log_returns)
+
+        if describe_returns:
+            print(df_ret.describe())
+
+        if bootstrap_ci and (print_return_stats or print_return_stats_by_symbol):
+            df_ci, pooled_ci = bootstrap_return_stats(
+                df_ret, obs_year, n_boot=n_boot, method=boot_method, block_size=boot_block_size, n_jobs=boot_n_jobs
+            )
+
+        if print_return_stats:
+            pooled = pooled_return_stats(df_ret, obs_year)
+            return_cols = ["ann_mean", "ann_vol", "skew", "kurtosis", "min", "max"]
+            if bootstrap_ci:
+                pooled.update(pooled_ci)
+                return_cols += bootstrap_columns()
+            df_pooled = pd.DataFrame.from_dict({"all": pooled}, orient="index")
+            df_pooled = df_pooled[return_cols]
+            df_pooled.index.name = "field"
+            print("\nreturn stats (pooled across symbols):\n" + df_pooled.to_string())
+            if sink is not None:
+                sink.write("return_stats_pooled", df_pooled)
+
+        if print_return_stats_by_symbol:
+            df_stats = return_stats_by_symbol(df_ret, obs_year)
+            if bootstrap_ci:
+                df_stats = df_stats.join(df_ci)
+            print("\nreturn stats by symbol:\n" + preview(df_stats, print_max_rows))
+            if sink is not None:
+                sink.write("return_stats_by_symbol", df_stats)
+
+        write_corr = sink is not None and write_corr_matrix
+        if (print_corr_returns or write_corr) and df_all.shape[1] > 1:
+            corr = df_ret.corr()
+            if print_corr_returns:
+                print("\ncorrelations:\n" + preview(corr, print_max_rows))
+            if write_corr:
+                sink.write("corr", corr)
+
+        if compute_corr_stats and df_all.shape[1] > 1:
+            corr_cols = ["median", "mean", "sd", "min", "max"]
+            if corr_stats_method == "approx":
+                corr_stats = corr_offdiag_stats_approx(df_ret, n_factors=corr_n_factors)
+                corr_cols += ["err_mean_abs", "err_max_abs"]
+            else:
+                corr_stats = corr_offdiag_stats(df_ret)
             df_corr_stats = pd.DataFrame.from_dict({"returns": corr_stats}, orient="index")
-            df_corr_stats = df_corr_stats[["median", "mean", "sd", "min", "max"]]
+            df_corr_stats = df_corr_stats[corr_cols]
             df_corr_stats.index.name = "field"
             print("\noff-diagonal correlation stats:\n" + df_corr_stats.to_string())
+            if sink is not None:
+                sink.write("corr_stats", df_corr_stats)
+    finally:
+        # always wait for pending writes and write run_metadata.json, also after an error
+        if sink is not None:
+            sink.close()
+    if sink is not None:
+        print("\nwrote results to", out_results_dir)
 
     elapsed = time.perf_counter() - t_start
     print(f"\ntime elapsed: {elapsed:.3f} seconds")
@@ -0,0 +1,329 @@
+"""
+Serve return and correlation summaries over HTTP on localhost, keeping price panels loaded in memory.
+
+Endpoints (GET, JSON responses):
+  /stats            pooled return stats
+  /stats_by_symbol  return stats by symbol
+  /corr_stats       off-diagonal correlation summary stats
+  /files            loaded price files, versions and fields
+  /metrics          request counts, latency and cache hit rates
+Query parameters: file, field, start, end, symbols (comma-separated), log (0/1), scale, and for /corr_stats
+method (exact/approx) and factors. field defaults to the only field of a flat file (labelled by the file stem) or
+"Adj Close". Example:
+  curl "http://127.0.0.1:8765/stats_by_symbol?field=Adj%20Close&symbols=AAPL,MSFT&start=2020-01-01"
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import pandas as pd
+
+from stats import (
+    compute_returns,
+    pooled_return_stats,
+    return_stats_by_symbol,
+    corr_offdiag_stats,
+    corr_offdiag_stats_approx,
+)
+from prices_io import read_prices_file, get_fields_from_df, get_prices_for_field
+
+ENDPOINTS = ["/stats", "/stats_by_symbol", "/corr_stats"]
+
+
+def _to_json_records(df: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Return df (index included) as JSON-ready records, with NaN as None."""
+    return json.loads(df.reset_index().to_json(orient="records", date_format="iso"))
+
+
+class _Panel:
+    """A price file loaded in memory, with the (mtime, size) version it was loaded from.
+
+    A flat file (one column per symbol) holds a single field, labelled by the file stem, e.g. "adj_close".
+    """
+
+    def __init__(self, path: Path):
+        stat = path.stat()
+        self.version = (stat.st_mtime_ns, stat.st_size)
+        self.df_all = read_prices_file(path)
+        self.fields = get_fields_from_df(self.df_all, flat_field=path.stem)
+
+
+class StatsService:
+    """Price panels kept in memory, an LRU cache of query results, and latency / cache metrics.
+
+    Results are cached by (file, file version, endpoint, field, window, symbols, settings) and computed from the
+    panel of that version, so a file that changes on disk is reloaded on the next query and older results are never
+    served for it. Concurrent requests for the same key wait for a single computation instead of repeating it.
+    """
+
+    def __init__(self, files: List[str], obs_year: int = 252, cache_size: int = 256, latency_window: int = 1000):
+        self.obs_year = obs_year
+        self._paths = {Path(f).name: Path(f) for f in files}
+        self._panels: Dict[str, _Panel] = {}
+        self._load_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+        self._errors = 0
+        self._latencies: deque = deque(maxlen=latency_window)
+        self._t_start = time.perf_counter()
+        self._cache_size = cache_size
+        self._cache: "OrderedDict[tuple, Any]" = OrderedDict()
+        self._in_flight: Dict[tuple, Future] = {}
+        self._cache_lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._waits = 0
+        for name in self._paths:
+            self._panel(name)
+
+    def _panel(self, name: str) -> _Panel:
+        """Return the loaded panel for file name, reloading it if the file changed on disk."""
+        path = self._paths[name]
+        stat = path.stat()
+        version = (stat.st_mtime_ns, stat.st_size)
+        panel = self._panels.get(name)
+        if panel is None or panel.version != version:
+            with self._load_lock:
+                panel = self._panels.get(name)
+                if panel is None or panel.version != version:
+                    t_load = time.perf_counter()
+                    panel = _Panel(path)
+                    self._panels[name] = panel
+                    print(f"loaded {name} {panel.df_all.shape} in {time.perf_counter() - t_load:.3f} seconds")
+        return panel
+
+    def _compute(
+        self,
+        df_all: pd.DataFrame,
+        endpoint: str,
+        field: str,
+        start: Optional[str],
+        end: Optional[str],
+        symbols: Optional[Tuple[str, ...]],
+        log_returns: bool,
+        ret_scale: float,
+        corr_method: str,
+        corr_n_factors: int,
+    ) -> Any:
+        df = get_prices_for_field(df_all, field)
+        if start is not None or end is not None:
+            df = df.loc[pd.to_datetime(start):pd.to_datetime(end)]
+        if symbols is not None:
+            df = df.loc[:, [s for s in symbols if s in df.columns]]
+        df_ret = ret_scale * compute_returns(df, log_returns=log_returns)
+
+        if endpoint == "/stats":
+            stats = pooled_return_stats(df_ret, self.obs_year)
+        elif endpoint == "/stats_by_symbol":
+            return _to_json_records(return_stats_by_symbol(df_ret, self.obs_year))
+        elif corr_method == "approx":
+            stats = corr_offdiag_stats_approx(df_ret, n_factors=corr_n_factors)
+        else:
+            stats = corr_offdiag_stats(df_ret)
+        return {k: (None if not np.isfinite(v) else float(v)) for k, v in stats.items()}
+
+    def query(self, endpoint: str, params: Dict[str, str]) -> Dict[str, Any]:
+        """Answer a stats query; raises KeyError or ValueError for bad parameters."""
+        if len(self._paths) == 1:
+            name = params.get("file", next(iter(self._paths)))
+        elif "file" in params:
+            name = params["file"]
+        else:
+            raise KeyError(f"missing parameter: file (loaded: {', '.join(self._paths)})")
+        if name not in self._paths:
+            raise KeyError(f"unknown file: {name}")
+        panel = self._panel(name)
+        field = params.get("field", panel.fields[0] if len(panel.fields) == 1 else "Adj Close")
+        if field not in panel.fields:
+            raise KeyError(f"unknown field: {field} (available: {', '.join(panel.fields)})")
+        symbols = params.get("symbols")
+        symbols = tuple(s.strip() for s in symbols.split(",") if s.strip()) if symbols else None
+        corr_method = params.get("method", "exact")
+        if corr_method not in ("exact", "approx"):
+            raise ValueError(f"unsupported method: {corr_method}")
+
+        key = (
+            name,
+            panel.version,
+            endpoint,
+            field,
+            params.get("start"),
+            params.get("end"),
+            symbols,
+            params.get("log", "0") in ("1", "true"),
+            float(params.get("scale", 100.0)),
+            corr_method if endpoint == "/corr_stats" else "",
+            int(params.get("factors", 20)) if endpoint == "/corr_stats" else 0,
+        )
+        return {"file": name, "field": field, "result": self._cached(key, panel.df_all)}
+
+    def _cached(self, key: tuple, df_all: pd.DataFrame) -> Any:
+        """Return the cached result for key, computing it from df_all at most once across concurrent requests."""
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self._hits += 1
+                return self._cache[key]
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._in_flight[key] = future
+                self._misses += 1
+            else:
+                self._waits += 1
+        if not owner:
+            return future.result()
+
+        try:
+            result = self._compute(df_all, *key[2:])
+        except BaseException as e:
+            with self._cache_lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._cache_lock:
+            self._cache[key] = result
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+            del self._in_flight[key]
+        future.set_result(result)
+        return result
+
+    def record(self, endpoint: str, elapsed: float, ok: bool) -> None:
+        with self._metrics_lock:
+            self._counts[endpoint] = self._counts.get(endpoint, 0) + 1
+            self._latencies.append(elapsed)
+            if not ok:
+                self._errors += 1
+
+    def files(self) -> Dict[str, Any]:
+        return {name: {"version": list(p.version), "shape": list(p.df_all.shape), "fields": p.fields}
+                for name, p in self._panels.items()}
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._cache_lock:
+            hits, misses, waits, size = self._hits, self._misses, self._waits, len(self._cache)
+        with self._metrics_lock:
+            lat = np.array(self._latencies) * 1000.0
+            counts = dict(self._counts)
+            errors = self._errors
+        lookups = hits + misses + waits
+        return {
+            "uptime_seconds": round(time.perf_counter() - self._t_start, 3),
+            "requests": counts,
+            "errors": errors,
+            "latency_ms": {
+                "n": int(lat.size),
+                "mean": float(lat.mean()) if lat.size > 0 else None,
+                "p50": float(np.percentile(lat, 50)) if lat.size > 0 else None,
+                "p95": float(np.percentile(lat, 95)) if lat.size > 0 else None,
+                "max": float(lat.max()) if lat.size > 0 else None,
+            },
+            "cache": {
+                "hits": hits,
+                "misses": misses,
+                "in_flight_waits": waits,
+                "hit_rate": (hits + waits) / lookups if lookups > 0 else None,
+                "size": size,
+                "max_size": self._cache_size,
+            },
+        }
+
+
+class _StatsHandler(BaseHTTPRequestHandler):
+    server: "StatsHTTPServer"
+
+    def do_GET(self) -> None:
+        t_start = time.perf_counter()
+        url = urlparse(self.path)
+        params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        service = self.server.service
+        status = 200
+        try:
+            if url.path in ENDPOINTS:
+                body = service.query(url.path, params)
+            elif url.path == "/files":
+                body = service.files()
+            elif url.path == "/metrics":
+                body = service.metrics()
+            else:
+                status, body = 404, {"error": f"unknown endpoint: {url.path}"}
+        except KeyError as e:
+            status, body = 400, {"error": str(e.args[0]) if e.args else "bad request"}
+        except ValueError as e:
+            status, body = 400, {"error": str(e)}
+        except Exception as e:
+            status, body = 500, {"error": repr(e)}
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        endpoint = url.path if url.path in ENDPOINTS or url.path in ("/files", "/metrics") else "other"
+        service.record(endpoint, time.perf_counter() - t_start, status == 200)
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class StatsHTTPServer(HTTPServer):
+    """HTTP server that handles requests on a fixed-size thread pool."""
+
+    def __init__(self, address: Tuple[str, int], service: StatsService, n_workers: int = 8, verbose: bool = False):
+        super().__init__(address, _StatsHandler)
+        self.service = service
+        self.verbose = verbose
+        self._pool = ThreadPoolExecutor(max_workers=n_workers)
+
+    def process_request(self, request, client_address) -> None:
+        self._pool.submit(self._process_request_worker, request, client_address)
+
+    def _process_request_worker(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self._pool.shutdown(wait=True)
+
+
+def main() -> int:
+    in_prices_files = ["prices.csv"] # ["prices.parquet", "adj_close.parquet"]
+    host = "127.0.0.1"
+    port = 8765
+    n_workers = 8
+    cache_size = 256
+    obs_year = 252
+    verbose = False
+
+    print("prices files:", in_prices_files)
+    service = StatsService(in_prices_files, obs_year=obs_year, cache_size=cache_size)
+    server = StatsHTTPServer((host, port), service, n_workers=n_workers, verbose=verbose)
+    print(f"serving on http://{host}:{port} with {n_workers} workers, cache size {cache_size}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -9,6 +9,7 @@ from yfinance_util import get_historical_prices
 from pathlib import Path
 from typing import List
 from stats import compute_returns, pooled_return_stats, return_stats_by_symbol, corr_offdiag_stats
+from results_sink import ResultsSink, preview
 
 
 def read_tickers(path: Path) -> List[str]:
@@ -46,6 +47,13 @@ print_return_stats = True              # pooled across symbols
 print_return_stats_by_symbol = True    # rows are symbols
 obs_year = 252
 
+# write result tables to out_results_dir (None to disable)
+# console shows at most print_max_rows rows and columns per table
+out_results_dir = None # "results"
+out_results_format = "parquet" # "arrow" # "csv"
+write_corr_matrix = False
+print_max_rows = 20 # None
+
 if symbols_file is not None:
     symbols = read_tickers(Path(symbols_file))
 else:
@@ -98,40 +106,74 @@ if out_base is not None:
     _write_prices(df, out_base)
     print("wrote prices to", str(out_base))
 
-return_stats = {}
-corr_stats = {}
-
-if describe_returns or print_corr_returns or compute_corr_stats or print_return_stats or print_return_stats_by_symbol:
-    df_ret = ret_scale * compute_returns(df, log_returns=use_log_returns)
-
-if describe_returns:
-    print(df_ret.describe())
-
-if print_return_stats:
-    return_stats[field] = pooled_return_stats(df_ret, obs_year)
-
-if print_return_stats_by_symbol:
-    df_stats = return_stats_by_symbol(df_ret, obs_year)
-    print("\nreturn stats by symbol:\n" + df_stats.to_string())
-
-if (compute_corr_stats or print_corr_returns) and len(symbols) > 1:
-    corr = df_ret.corr()
-    if print_corr_returns:
-        print("\ncorrelations:\n" + corr.to_string())
-    if compute_corr_stats:
-        corr_stats[field] = corr_offdiag_stats(df_ret)
-
-if compute_corr_stats and len(corr_stats) > 0:
-    df_corr_stats = pd.DataFrame.from_dict(corr_stats, orient="index")
-    df_corr_stats = df_corr_stats[["median", "mean", "sd", "min", "max"]]
-    df_corr_stats.index.name = "field"
-    print("\noff-diagonal correlation stats:\n" + df_corr_stats.to_string())
-
-if print_return_stats and len(return_stats) > 0:
-    df_return_stats = pd.DataFrame.from_dict(return_stats, orient="index")
-    df_return_stats = df_return_stats[["ann_mean", "ann_vol", "skew", "kurtosis", "min", "max"]]
-    df_return_stats.index.name = "field"
-    print("\nreturn stats (pooled across symbols):\n" + df_return_stats.to_string())
+sink = None
+if out_results_dir is not None:
+    sink = ResultsSink(out_results_dir, fmt=out_results_format, metadata={
+        "script": Path(__file__).name,
+        "symbols_file": symbols_file,
+        "n_symbols": len(symbols),
+        "start_date": start_date,
+        "end_date": end_date,
+        "field": field,
+        "return_type": "log" if use_log_returns else "simple",
+        "ret_scale": ret_scale,
+        "obs_year": obs_year,
+    })
+    print("results dir, format:", out_results_dir, out_results_format)
+
+write_corr = sink is not None and write_corr_matrix
+
+try:
+    return_stats = {}
+    corr_stats = {}
+
+    if (describe_returns or print_corr_returns or compute_corr_stats or print_return_stats
+            or print_return_stats_by_symbol or write_corr):
+        df_ret = ret_scale * compute_returns(df, log_returns=use_log_returns)
+
+    if describe_returns:
+        print(df_ret.describe())
+
+    if print_return_stats:
+        return_stats[field] = pooled_return_stats(df_ret, obs_year)
+
+    if print_return_stats_by_symbol:
+        df_stats = return_stats_by_symbol(df_ret, obs_year)
+        print("\nreturn stats by symbol:\n" + preview(df_stats, print_max_rows))
+        if sink is not None:
+            sink.write("return_stats_by_symbol", df_stats)
+
+    if (compute_corr_stats or print_corr_returns or write_corr) and len(symbols) > 1:
+        if print_corr_returns or write_corr:
+            corr = df_ret.corr()
+        if print_corr_returns:
+            print("\ncorrelations:\n" + preview(corr, print_max_rows))
+        if write_corr:
+            sink.write("corr", corr)
+        if compute_corr_stats:
+            corr_stats[field] = corr_offdiag_stats(df_ret)
+
+    if compute_corr_stats and len(corr_stats) > 0:
+        df_corr_stats = pd.DataFrame.from_dict(corr_stats, orient="index")
+        df_corr_stats = df_corr_stats[["median", "mean", "sd", "min", "max"]]
+        df_corr_stats.index.name = "field"
+        print("\noff-diagonal correlation stats:\n" + df_corr_stats.to_string())
+        if sink is not None:
+            sink.write("corr_stats", df_corr_stats)
+
+    if print_return_stats and len(return_stats) > 0:
+        df_return_stats = pd.DataFrame.from_dict(return_stats, orient="index")
+        df_return_stats = df_return_stats[["ann_mean", "ann_vol", "skew", "kurtosis", "min", "max"]]
+        df_return_stats.index.name = "field"
+        print("\nreturn stats (pooled across symbols):\n" + df_return_stats.to_string())
+        if sink is not None:
+            sink.write("return_stats_pooled", df_return_stats)
+finally:
+    # always wait for pending writes and write run_metadata.json, also after an error
+    if sink is not None:
+        sink.close()
+if sink is not None:
+    print("\nwrote results to", out_results_dir)
 
 elapsed = time.perf_counter() - t_start
 print(f"\ntime elapsed: {elapsed:.3f} seconds")
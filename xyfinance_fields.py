@@ -11,6 +11,7 @@ from yfinance_util import get_historical_prices
 from pathlib import Path
 from typing import List
 from stats import compute_returns, pooled_return_stats, return_stats_by_symbol, corr_offdiag_stats
+from results_sink import ResultsSink, preview
 
 def read_tickers(path: Path) -> List[str]:
     """Return tickers from a text file, skipping blank lines and lines starting with '#'."""
@@ -51,6 +52,13 @@ print_return_stats = True              # pooled across symbols, one row per fiel
 print_return_stats_by_symbol = True    # one table per field, rows are symbols
 obs_year = 252
 
+# write result tables to out_results_dir (None to disable)
+# console shows at most print_max_rows rows and columns per table
+out_results_dir = None # "results"
+out_results_format = "parquet" # "arrow" # "csv"
+write_corr_matrix = False
+print_max_rows = 20 # None
+
 
 def _write_prices(df: pd.DataFrame, out_path: Path) -> None:
     suffix = out_path.suffix.lower()
@@ -87,90 +95,125 @@ out_base = Path(out_prices_file) if out_prices_file is not None else None
 # download once (all fields), then iterate
 data_all = get_historical_prices(symbols, start_date, end_date, field=None)
 
-corr_stats = {}
-df_all = None
-
-symbols_out = [s.lstrip("^") for s in symbols]
+sink = None
+if out_results_dir is not None:
+    sink = ResultsSink(out_results_dir, fmt=out_results_format, metadata={
+        "script": Path(__file__).name,
+        "symbols_file": symbols_file,
+        "n_symbols": len(symbols),
+        "start_date": start_date,
+        "end_date": end_date,
+        "fields_ret": fields_ret,
+        "return_type": "log" if use_log_returns else "simple",
+        "ret_scale": ret_scale,
+        "obs_year": obs_year,
+    })
+    print("results dir, format:", out_results_dir, out_results_format)
 
-return_stats = {}
+write_corr = sink is not None and write_corr_matrix
 
-for field in fields:
-    print("\nfield:", field)
+try:
+    corr_stats = {}
+    df_all = None
 
-    df = data_all[field]
-    df = df[[symbol for symbol in symbols]]
-    df.columns = [c.lstrip("^") for c in df.columns]
+    symbols_out = [s.lstrip("^") for s in symbols]
 
-    if dropna_df:
-        df = df.dropna()
+    return_stats = {}
 
-    # print #obs, first, last
-    if len(df.index) > 0:
-        print("#obs, first, last:", len(df.index), df.index[0].date(), df.index[-1].date())
-    else:
-        print("#obs, first, last:", 0, "nan", "nan")
+    for field in fields:
+        print("\nfield:", field)
 
-    if print_prices:
-        print(df)
+        df = data_all[field]
+        df = df[[symbol for symbol in symbols]]
+        df.columns = [c.lstrip("^") for c in df.columns]
 
-    if out_base is not None and not write_single_csv_all_fields:
-        field_safe = field.replace(" ", "_")
-        out_file = out_base.with_name(f"{out_base.stem}_{field_safe}{out_base.suffix}")
-        _write_prices(df, out_file)
-        print("wrote prices to", str(out_file))
+        if dropna_df:
+            df = df.dropna()
 
-    if out_base is not None and write_single_csv_all_fields:
-        df2 = df.copy()
-        df2.columns = pd.MultiIndex.from_product([df2.columns, [field]], names=["symbol", "field"])
-        if df_all is None:
-            df_all = df2
+        # print #obs, first, last
+        if len(df.index) > 0:
+            print("#obs, first, last:", len(df.index), df.index[0].date(), df.index[-1].date())
         else:
-            df_all = pd.concat([df_all, df2], axis=1)
-
-    # returns / stats / correlations only for fields in fields_ret
-    if field in fields_ret:
-        if describe_returns or print_corr_returns or compute_corr_stats or print_return_stats or print_return_stats_by_symbol:
-            df_ret = ret_scale * compute_returns(df, log_returns=use_log_returns)
-
-        if describe_returns:
-            print(df_ret.describe())
-
-        if print_return_stats:
-            return_stats[field] = pooled_return_stats(df_ret, obs_year)
-
-        if print_return_stats_by_symbol:
-            df_stats = return_stats_by_symbol(df_ret, obs_year)
-            print("\nreturn stats by symbol (" + field.replace(" ", "_") + "):\n" + df_stats.to_string())
-
-        if (compute_corr_stats or print_corr_returns) and len(symbols) > 1:
-            corr = df_ret.corr()
-            if print_corr_returns:
-                print("\ncorrelations (" + field.replace(" ", "_") + "):\n" + corr.to_string())
-
-            if compute_corr_stats:
-                corr_stats[field] = corr_offdiag_stats(df_ret)
-
-if out_base is not None and write_single_csv_all_fields and df_all is not None:
-    df_all = df_all.reindex(
-        columns=pd.MultiIndex.from_product([symbols_out, fields], names=["symbol", "field"])
-    )
-    _write_prices(df_all, out_base)
-    print("\nwrote prices (all fields) to", str(out_base))
-
-# only print corr stats / return stats for fields_ret (and keep order = fields_ret)
-if compute_corr_stats and len(corr_stats) > 0:
-    df_corr_stats = pd.DataFrame.from_dict(corr_stats, orient="index")
-    df_corr_stats = df_corr_stats.reindex(fields_ret)
-    df_corr_stats = df_corr_stats[["median", "mean", "sd", "min", "max"]]
-    df_corr_stats.index.name = "field"
-    print("\noff-diagonal correlation stats by field:\n" + df_corr_stats.to_string())
-
-if print_return_stats and len(return_stats) > 0:
-    df_return_stats = pd.DataFrame.from_dict(return_stats, orient="index")
-    df_return_stats = df_return_stats.reindex(fields_ret)
-    df_return_stats = df_return_stats[["ann_mean", "ann_vol", "skew", "kurtosis", "min", "max"]]
-    df_return_stats.index.name = "field"
-    print("\nreturn stats (pooled across symbols):\n" + df_return_stats.to_string())
+            print("#obs, first, last:", 0, "nan", "nan")
+
+        if print_prices:
+            print(df)
+
+        if out_base is not None and not write_single_csv_all_fields:
+            field_safe = field.replace(" ", "_")
+            out_file = out_base.with_name(f"{out_base.stem}_{field_safe}{out_base.suffix}")
+            _write_prices(df, out_file)
+            print("wrote prices to", str(out_file))
+
+        if out_base is not None and write_single_csv_all_fields:
+            df2 = df.copy()
+            df2.columns = pd.MultiIndex.from_product([df2.columns, [field]], names=["symbol", "field"])
+            if df_all is None:
+                df_all = df2
+            else:
+                df_all = pd.concat([df_all, df2], axis=1)
+
+        # returns / stats / correlations only for fields in fields_ret
+        if field in fields_ret:
+            if (describe_returns or print_corr_returns or compute_corr_stats or print_return_stats
+                    or print_return_stats_by_symbol or write_corr):
+                df_ret = ret_scale * compute_returns(df, log_returns=use_log_returns)
+
+            if describe_returns:
+                print(df_ret.describe())
+
+            if print_return_stats:
+                return_stats[field] = pooled_return_stats(df_ret, obs_year)
+
+            if print_return_stats_by_symbol:
+                df_stats = return_stats_by_symbol(df_ret, obs_year)
+                print("\nreturn stats by symbol (" + field.replace(" ", "_") + "):\n"
+                      + preview(df_stats, print_max_rows))
+                if sink is not None:
+                    sink.write("return_stats_by_symbol_" + field, df_stats)
+
+            if (compute_corr_stats or print_corr_returns or write_corr) and len(symbols) > 1:
+                if print_corr_returns or write_corr:
+                    corr = df_ret.corr()
+                if print_corr_returns:
+                    print("\ncorrelations (" + field.replace(" ", "_") + "):\n" + preview(corr, print_max_rows))
+                if write_corr:
+                    sink.write("corr_" + field, corr)
+
+                if compute_corr_stats:
+                    corr_stats[field] = corr_offdiag_stats(df_ret)
+
+    if out_base is not None and write_single_csv_all_fields and df_all is not None:
+        df_all = df_all.reindex(
+            columns=pd.MultiIndex.from_product([symbols_out, fields], names=["symbol", "field"])
+        )
+        _write_prices(df_all, out_base)
+        print("\nwrote prices (all fields) to", str(out_base))
+
+    # only print corr stats / return stats for fields_ret (and keep order = fields_ret)
+    if compute_corr_stats and len(corr_stats) > 0:
+        df_corr_stats = pd.DataFrame.from_dict(corr_stats, orient="index")
+        df_corr_stats = df_corr_stats.reindex(fields_ret)
+        df_corr_stats = df_corr_stats[["median", "mean", "sd", "min", "max"]]
+        df_corr_stats.index.name = "field"
+        print("\noff-diagonal correlation stats by field:\n" + df_corr_stats.to_string())
+        if sink is not None:
+            sink.write("corr_stats", df_corr_stats)
+
+    if print_return_stats and len(return_stats) > 0:
+        df_return_stats = pd.DataFrame.from_dict(return_stats, orient="index")
+        df_return_stats = df_return_stats.reindex(fields_ret)
+        df_return_stats = df_return_stats[["ann_mean", "ann_vol", "skew", "kurtosis", "min", "max"]]
+        df_return_stats.index.name = "field"
+        print("\nreturn stats (pooled across symbols):\n" + df_return_stats.to_string())
+        if sink is not None:
+            sink.write("return_stats_pooled", df_return_stats)
+finally:
+    # always wait for pending writes and write run_metadata.json, also after an error
+    if sink is not None:
+        sink.close()
+if sink is not None:
+    print("\nwrote results to", out_results_dir)
 
 elapsed = time.perf_counter() - t_start
 print(f"\ntime elapsed: {elapsed:.3f} seconds")